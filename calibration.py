@@ -14,41 +14,164 @@ def objective(params, Z, R):
     # Extract parameters
     a, b = params
 
-    # Compute radar rain
-    radar_rain = (Z/a)**(1/b)
+    # Compute radar rain, raising to the power in place to avoid a second temporary
+    radar_rain = Z / a
+    np.power(radar_rain, 1/b, out=radar_rain)
     # Convert from 6min to 60min
     radar_rain_hour = np.mean(radar_rain, axis=1)
     # Compute Mean Squared Error
-    MSE = np.mean((radar_rain_hour - R)**2)
+    residual = radar_rain_hour - R
+    MSE = np.dot(residual, residual) / len(residual)
 
     return MSE
 
 
-def calibrate(Z, R, a_guess=400, b_guess=1.6, b_lb=1.5, b_ub=1.6):
+def objective_and_gradient(params, log_Z, R):
+    '''
+    Method to compute the objective together with its analytic gradient.
+
+    @param params tuple[float]: Parameters a and b.
+    @param log_Z array[float]: Natural logarithm of the reflectivity values of all events, precomputed once per calibration.
+    @param R array[float]: Vector of rainfall values of all events.
+
+    @return MSE float: Mean Squared Error to be minimized.
+    @return grad array[float]: Partial derivatives of MSE with respect to a and b.
+    '''
+    # Extract parameters
+    a, b = params
+
+    # Compute radar rain as exp(log(Z/a)/b), reusing log(Z/a) for the gradient
+    log_ratio = log_Z - np.log(a)
+    radar_rain = np.exp(log_ratio / b)
+    # Convert from 6min to 60min
+    radar_rain_hour = np.mean(radar_rain, axis=1)
+    # Compute Mean Squared Error
+    residual = radar_rain_hour - R
+    MSE = np.dot(residual, residual) / len(residual)
+
+    # Derivatives of the hourly radar rain, where Z = 0 (log(Z/a) = -inf, radar rain 0) contributes 0
+    d_hour_da = -radar_rain_hour / (a*b)
+    d_radar_rain_db = np.multiply(log_ratio, radar_rain, out=np.zeros_like(radar_rain), where=radar_rain > 0)
+    d_hour_db = -np.mean(d_radar_rain_db, axis=1) / b**2
+
+    # Chain rule through the Mean Squared Error
+    grad = 2 * np.array([np.dot(residual, d_hour_da), np.dot(residual, d_hour_db)]) / len(residual)
+
+    return MSE, grad
+
+
+def objective_and_gradient_log_a(params, log_Z, R):
+    '''
+    Method to compute the objective and its gradient with respect to log(a) and b.
+
+    Parameter a is in the hundreds while b is close to 1, so optimizing over log(a) keeps
+    both parameters on a similar scale and prevents the optimizer from stopping early.
+
+    @param params tuple[float]: Parameters log(a) and b.
+    @param log_Z array[float]: Natural logarithm of the reflectivity values of all events, precomputed once per calibration.
+    @param R array[float]: Vector of rainfall values of all events.
+
+    @return MSE float: Mean Squared Error to be minimized.
+    @return grad array[float]: Partial derivatives of MSE with respect to log(a) and b.
+    '''
+    # Extract parameters
+    log_a, b = params
+    a = np.exp(log_a)
+
+    # Compute objective and gradient for a and b
+    MSE, grad = objective_and_gradient((a, b), log_Z, R)
+
+    # Chain rule from a to log(a)
+    grad[0] *= a
+
+    return MSE, grad
+
+
+def fit_log_linear(Z, R, b_lb=1.5, b_ub=1.6):
+    '''
+    Method to fit Z = aR^b in closed form, by solving log(Z) = log(a) + b*log(R) with linear least squares.
+
+    @param Z array[float]: Vector of reflectivity values of all events.
+    @param R array[float]: Vector of rainfall values of all events.
+    @param b_lb float: Lower bound for parameter b.
+    @param b_ub float: Upper bound for parameter b.
+
+    @return a float: Value for a that fits the log-linear relationship.
+    @return b float: Value for b that fits the log-linear relationship.
+    '''
+    # Convert from 6min to 60min
+    Z_hour = np.mean(Z, axis=1)
+
+    # Only strictly positive pairs can be taken the log of
+    mask = (Z_hour > 0) & (R > 0)
+    log_Z = np.log(Z_hour[mask])
+    log_R = np.log(R[mask])
+
+    # Solve for log(a) and b in one least squares call
+    A = np.column_stack([np.ones_like(log_R), log_R])
+    (log_a, b), *_ = np.linalg.lstsq(A, log_Z, rcond=None)
+
+    # Enforce bounds on b and re-solve a for the clipped b
+    if not b_lb <= b <= b_ub:
+        b = np.clip(b, b_lb, b_ub)
+        log_a = np.mean(log_Z - b*log_R)
+
+    a = np.exp(log_a)
+
+    return a, b
+
+
+def calibrate(Z, R, a_guess=None, b_guess=None, b_lb=1.5, b_ub=1.6, max_restarts=10):
     '''
     Method which learns the parameters a and b in the relationship Z = aR^b.
 
     @param Z array[float]: Vector of reflectivity values of all events.
     @param R array[float]: Vector of rainfall values of all events.
-    @param a_guess float: Initial guess for parameter a.
-    @param b_guess float: Initial guess for parameter b.
+    @param a_guess float: Initial guess for parameter a (closed-form log-linear fit if None).
+    @param b_guess float: Initial guess for parameter b (closed-form log-linear fit if None).
     @param b_lb float: Lower bound for parameter b.
     @param b_ub float: Upper bound for parameter b.
+    @param max_restarts int: Maximum number of times the optimizer is restarted from its last result.
 
     @return a float: Value for a that minimizes objective function.
     @return b float: Value for b that minimizes objective function.
     '''
 
-    # Initial guess for a and b
-    init_guess = [a_guess, b_guess]
+    # Ensure contiguous float64 arrays, so the objective does not convert on every evaluation
+    Z = np.ascontiguousarray(Z, dtype=np.float64)
+    R = np.ascontiguousarray(R, dtype=np.float64)
+
+    # Start from the closed-form log-linear fit if no guess is given
+    if a_guess is None or b_guess is None:
+        a_fit, b_fit = fit_log_linear(Z, R, b_lb, b_ub)
+        a_guess = a_fit if a_guess is None else a_guess
+        b_guess = b_fit if b_guess is None else b_guess
+
+    # Initial guess for log(a) and b
+    init_guess = [np.log(a_guess), b_guess]
 
     # Bounds
     bounds = ((None, None), (b_lb, b_ub))
 
-    # Minimize objective
-    result = minimize(objective, init_guess, args=(Z, R), bounds=bounds)
+    # Logarithm of Z does not depend on the parameters, so compute it once
+    # Z = 0 gives -inf, which maps back to radar rain 0 in the objective
+    with np.errstate(divide='ignore'):
+        log_Z = np.log(Z)
+
+    # Minimize objective over log(a) and b with analytic gradient, L-BFGS-B handles the bounds on b
+    # The objective is badly conditioned along a curved valley, where L-BFGS-B can stop on
+    # relative reduction of f while the gradient is still non-zero. Restarting resets its
+    # Hessian approximation, so restart from the last result until it no longer improves.
+    best_MSE = np.inf
+    for _ in range(max_restarts + 1):
+        result = minimize(objective_and_gradient_log_a, init_guess, args=(log_Z, R), jac=True, method='L-BFGS-B', bounds=bounds, options={'ftol': 1e-12})
+        if result.fun >= best_MSE * (1 - 1e-12):
+            break
+        best_MSE = result.fun
+        init_guess = result.x
 
     # Extract optimal a and b
-    a, b = result.x
+    log_a, b = init_guess
+    a = np.exp(log_a)
 
     return a, b
\ No newline at end of file
@@ -14,14 +14,18 @@ def compute_station_distances(location_filtered):
     # Init empty distance matrix
     empty_gauges = np.zeros((len(location_filtered), len(location_filtered)))
 
+    # Extract coordinates once as numpy arrays, avoiding pandas indexing in the loops
+    lats = location_filtered['LAT'].to_numpy()
+    longs = location_filtered['LONG'].to_numpy()
+
     # Loop over stations
     for i in range(len(location_filtered)):
         # Retrieve its coordinates
-        coordinate_1 = (location_filtered['LAT'].iloc[i], location_filtered['LONG'].iloc[i])
+        coordinate_1 = (lats[i], longs[i])
         # Loop over remaining stations
         for j in range(i, len(location_filtered)):
             # Retrieve its coordinates
-            coordinate_2 = (location_filtered['LAT'].iloc[j], location_filtered['LONG'].iloc[j])
+            coordinate_2 = (lats[j], longs[j])
             # Compute distance between stations
             empty_gauges[i, j] = geopy.distance.geodesic(coordinate_1, coordinate_2).km
 
@@ -51,14 +55,17 @@ def compute_correlations(location_filtered, rain_data_daily, index_distances_1):
     # Init correlation matrix
     corr_empty = np.empty((len(location_filtered), len(location_filtered)))
 
+    # Extract rain data once as numpy array, avoiding pandas indexing in the loops
+    rain_values = rain_data_daily.to_numpy()
+
     # Loop over stations
     for i in range(len(location_filtered)):
         # Get rain data of station
-        array_filtered_1 = rain_data_daily.iloc[:, i]
+        array_filtered_1 = rain_values[:, i]
         # Loop over remaining stations
         for j in range(len(location_filtered)):
             # Get rain data of station
-            array_filtered_2 = rain_data_daily.iloc[:, j]
+            array_filtered_2 = rain_values[:, j]
             # Compute and store correlation between stations
             corr_empty[i, j] = correl(array_filtered_1, array_filtered_2)
 
@@ -85,16 +92,20 @@ def maximum_radius(distance_df, correlation_df, min_correlation, max_error, max_
     max_distance_stations = None
     max_radius = float('inf')
 
+    # Extract matrices once as numpy arrays, avoiding pandas indexing in the loops
+    distances = distance_df.to_numpy()
+    correlations = correlation_df.to_numpy()
+
     for i in range(len(distance_df)):
         for j in range(i+1, len(distance_df)):
-            distance = distance_df.iloc[i, j]
-            correlation = correlation_df.iloc[i, j]
+            distance = distances[i, j]
+            correlation = correlations[i, j]
 
             if correlation >= min_correlation and abs(correlation - min_correlation) <= max_error:
                 if distance > max_distance:
                     max_distance = distance
                     max_distance_stations = (stations[i], stations[j])
-                    max_radius = distance_df.iloc[max_distance_stations[0], max_distance_stations[1]]
+                    max_radius = distances[max_distance_stations[0], max_distance_stations[1]]
 
     max_radius = min(max_radius, max_radius_lim)
 
@@ -126,9 +137,12 @@ def compute_DM_data(distance_df, correlation_df, rain_gauge_df):
     for index in distance_df.index:
         stations_dict[index] = []
     
+    # Extract distance matrix once as numpy array, avoiding pandas indexing in the loops
+    distances = distance_df.to_numpy()
+
     for i in range(len(distance_df)):
         for j in range(i+1, len(distance_df)):
-            distance = distance_df.iloc[i, j]
+            distance = distances[i, j]
             
             if distance < max_radius:
                 station_i = distance_df.index[i]
@@ -1,26 +1,57 @@
 import numpy as np
 import pandas as pd
-import math
-from statistics import mean
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
 from datetime import datetime, timedelta
 from matplotlib.patches import Rectangle
+from matplotlib.collections import PatchCollection
 import matplotlib.pyplot as plt
 import matplotlib.dates as mdates
 
+# Attributes of single-station events, stored as struct of arrays during event selection
+EVENT_FIELDS = ('start_time', 'end_time', 'station', \
+                'reflect_min', 'reflect_avg', 'reflect_max', \
+                'rain_intens_min', 'rain_intens_avg', 'rain_intens_max')
+
+
+# Upper bounds of average rain intensity (in mm/h) per event type
+EVENT_TYPE_BOUNDS = np.array([5.0, 25.0, 50.0])
+EVENT_TYPES = np.array(['light', 'moderate', 'heavy', 'extreme'])
+
+
+def classify_events(rain_intens_avg):
+    '''
+    Method to classify events by their average rain intensity.
+
+    @param rain_intens_avg array[float]: Average rain intensity (in mm/h) per event
+
+    @return types array[str]: Type per event (light, moderate, heavy or extreme)
+    '''
+    # Bins are closed on the right, so a bound itself belongs to the lower type
+    return EVENT_TYPES[np.digitize(rain_intens_avg, EVENT_TYPE_BOUNDS, right=True)]
+
+
 class Event:
     '''
     Rainfall event class
     '''
-    
-    def __init__(self, start_time, end_time, stations, reflect_min, reflect_avg, reflect_max, rain_intens_min, rain_intens_avg, rain_intens_max):
+
+    # Fixed set of attributes, so instances carry no per-instance dict
+    __slots__ = ('start_time', 'end_time', 'duration', \
+                 'stations', 'num_stations', \
+                 'reflect_min', 'reflect_avg', 'reflect_max', \
+                 'rain_intens_min', 'rain_intens_avg', 'rain_intens_max', 'rain_cum_avg', \
+                 'type')
+
+    def __init__(self, start_time, end_time, stations, reflect_min, reflect_avg, reflect_max, rain_intens_min, rain_intens_avg, rain_intens_max, type=None):
         
         # Set time properties
         self.start_time = start_time
         self.end_time = end_time
-        self.duration = int((end_time - start_time).total_seconds() // 3600)
+        self.duration = int((end_time - start_time) // np.timedelta64(1, 'h'))
 
         # Set station properties
-        self.stations = stations
+        self.stations = tuple(stations)
         self.num_stations = len(stations)
         
         # Set reflectivity properties
@@ -34,23 +65,18 @@ class Event:
         self.rain_intens_max = rain_intens_max
         self.rain_cum_avg = rain_intens_avg * self.duration
 
-        # Set type
-        if self.rain_intens_avg <= 5.0:
-            self.type = "light"
-        elif self.rain_intens_avg <= 25.0:
-            self.type = "moderate"
-        elif self.rain_intens_avg <= 50.0:
-            self.type = "heavy"
-        else:
-            self.type = "extreme"
+        # Set type, if not already classified in batch
+        if type is None:
+            type = classify_events(rain_intens_avg)
+        self.type = str(type)
 
     def to_string(self):
         '''
         Method to print the attributes of the event.
         '''
         return (
-            'Start time: ' + str(self.start_time) + 
-            '\nEnd time: ' + str(self.end_time) + 
+            'Start time: ' + str(pd.Timestamp(self.start_time)) + 
+            '\nEnd time: ' + str(pd.Timestamp(self.end_time)) + 
             '\nDuration: ' + str(self.duration) +
             '\nStations: ' + str(self.stations) +
             '\nNum stations: ' + str(self.num_stations) +
@@ -61,171 +87,188 @@ class Event:
         )
 
 
-def select_events_single_station(station, vals, datetime, radar_df, max_no_rain, min_rain_threshold=0.1, temporal_res='6min'):
+def select_events_single_station(station, vals, datetime, radar_vals, radar_start, radar_stop, max_no_rain, min_rain_threshold=0.1, temporal_res='6min'):
     '''
     Method to select events per station.
 
     @param station str: Name of station
-    @param vals list[float]: Rain data of given station for one year
-    @param datetime list[date]: List of dates and times per hour for the entire year
-    @param radar_df DataFrame: Radar data for one year of all stations
+    @param vals array[float]: Rain data of given station for one year
+    @param datetime array[datetime64]: Dates and times per hour for the entire year
+    @param radar_vals array[float]: Radar data of given station for one year
+    @param radar_start array[int]: Position of the first radar value at or after each timestep in datetime
+    @param radar_stop array[int]: Position of the last radar value at or before each timestep in datetime
     @param max_no_rain float: Maximum number of hours without rain within one event
     @param k float: Rainfall threshold
 
-    @return events list[Event]: List of events at this station for the given year
-    @return Z list[float]: List of reflectivity values per hour within events at this station
-    @return R list[float]: List of rainfall values per hour within events at this station
+    @return events dict{str: array}: Events at this station for the given year, one array per attribute
+    @return Z array[float]: Vector of reflectivity values per hour within events at this station
+    @return R array[float]: Vector of rainfall values per hour within events at this station
     '''
-    events = []
-    Z = []
-    R = []
-
-    i = 0
-    while i < len(vals):
-        # Check if value is above threshold
-        if vals.iloc[i] >= min_rain_threshold:
-            # Init statistics for event
-            candidate_event = []
-            consecutive_hours_no_rain = 0
-
-            # Loop over remaining values
-            for j in range(i, len(vals)):
-                # Retrieve value
-                val = vals.iloc[j]
-                # Add to event
-                candidate_event.append(val)
-
-                # Check if value is above threshold
-                if val >= min_rain_threshold:
-                    # Reset statistic
-                    consecutive_hours_no_rain = 0
-                else:
-                    # Update statistic
-                    consecutive_hours_no_rain += 1
-                    # Check if max hours without rain is exceeded
-                    if consecutive_hours_no_rain > max_no_rain:
-                        # Set event time
-                        start_time = datetime[i]
-                        end_time = datetime[j - max_no_rain]
-
-                        # Set event reflectivity
-                        reflect_vals = list(radar_df.loc[start_time:end_time][station].values)[:-1]
-                        if len(reflect_vals) == 0:
-                            reflect_min = float('nan')
-                            reflect_avg = float('nan')
-                            reflect_max = float('nan')
-                        else:
-                            reflect_min = min(reflect_vals)
-                            reflect_avg = mean(reflect_vals)
-                            reflect_max = max(reflect_vals)
-
-                        # Set event rain
-                        rain_vals = candidate_event[:-consecutive_hours_no_rain]
-                        if len(rain_vals) == 0:
-                            rain_intens_min = float('nan')
-                            rain_intens_avg = float('nan')
-                            rain_intens_max = float('nan')
-                        else:
-                            rain_intens_min = min(rain_vals)
-                            rain_intens_avg = mean(rain_vals)
-                            rain_intens_max = max(rain_vals)
-
-                        # Check if no nan values in event, otherwise event is discarded
-                        if not math.isnan(rain_intens_avg):
-                            # Create new event
-                            new_event = Event(start_time, end_time, [station], reflect_min, reflect_avg, reflect_max, rain_intens_min, rain_intens_avg, rain_intens_max)
-
-                            # Add to events list
-                            events.append(new_event)
-
-                            # Store rain intensity values
-                            R += rain_vals
-
-                            # Check if 6min sampling vs 60min sampling is still correct
-                            if temporal_res == '6min':
-                                if len(reflect_vals) != 10*len(rain_vals):
-                                    raise Exception("Radar dataframe should be sampled per 6min and rain gauge dataframe per 60min. \
-                                                    Please check if this is the case!\n \
-                                                    The problem occured at station: ",  station, ", from: ", start_time, ", until: ", end_time)
-                            elif temporal_res == '60min' or temporal_res == '1H':
-                                if len(reflect_vals) != len(rain_vals):
-                                    raise Exception("Radar dataframe should be sampled per 60min and rain gauge dataframe per 60min. \
-                                                    Please check if this is the case!\n \
-                                                    The problem occured at station: ",  station, ", from: ", start_time, ", until: ", end_time)
-                            
-                            # Store reflectivity values
-                            Z += reflect_vals
-
-                        # Continue events selection after end of new event
-                        i = j + 1
-                        break
-            
-        # Go to next timestep
-        i += 1
+    # Init event attributes as struct of arrays
+    events = {field: [] for field in EVENT_FIELDS}
+    Z_chunks = []
+    R_chunks = []
+
+    # Convert to numpy array once, so no pandas indexing is needed per timestep
+    vals = np.asarray(vals, dtype=np.float64)
+
+    # Indices of timesteps above threshold (nan counts as no rain)
+    wet_idx = np.flatnonzero(vals >= min_rain_threshold)
+
+    # Split into runs of rain separated by more than max hours without rain
+    gap_hours_no_rain = np.diff(wet_idx) - 1
+    breaks = np.flatnonzero(gap_hours_no_rain > max_no_rain)
+    run_firsts = np.concatenate(([0], breaks + 1))
+    run_lasts = np.concatenate((breaks, [len(wet_idx) - 1]))
+
+    # First timestep from which a new event may start
+    next_start = 0
+
+    # Loop over runs of rain
+    for (first, last) in zip(run_firsts, run_lasts):
+        # Skip timesteps already consumed by the previous event
+        first = max(first, np.searchsorted(wet_idx, next_start))
+        if first > last:
+            continue
+
+        # Event is only closed when max hours without rain is exceeded, otherwise it is discarded
+        i = wet_idx[first]
+        last_rain = wet_idx[last]
+        j = last_rain + max_no_rain + 1
+        if j >= len(vals):
+            break
+
+        # Continue events selection after end of new event
+        next_start = j + 2
+
+        # Set event time
+        start_time = datetime[i]
+        end_time = datetime[last_rain + 1]
+
+        # Set event reflectivity, radar values from start time up to (excluding) end time
+        reflect_vals = radar_vals[radar_start[i]:radar_stop[last_rain + 1]]
+        if len(reflect_vals) == 0:
+            reflect_min = float('nan')
+            reflect_avg = float('nan')
+            reflect_max = float('nan')
+        else:
+            reflect_min = np.min(reflect_vals)
+            reflect_avg = np.mean(reflect_vals)
+            reflect_max = np.max(reflect_vals)
+
+        # Set event rain
+        rain_vals = vals[i:last_rain + 1]
+        rain_intens_min = np.min(rain_vals)
+        rain_intens_avg = np.mean(rain_vals)
+        rain_intens_max = np.max(rain_vals)
+
+        # Check if no nan values in event, otherwise event is discarded
+        if not np.isnan(rain_intens_avg):
+            # Add attributes of new event
+            new_event = (start_time, end_time, station, reflect_min, reflect_avg, reflect_max, rain_intens_min, rain_intens_avg, rain_intens_max)
+            for (field, value) in zip(EVENT_FIELDS, new_event):
+                events[field].append(value)
+
+            # Store rain intensity values
+            R_chunks.append(rain_vals)
+
+            # Check if 6min sampling vs 60min sampling is still correct
+            if temporal_res == '6min':
+                if len(reflect_vals) != 10*len(rain_vals):
+                    raise Exception("Radar dataframe should be sampled per 6min and rain gauge dataframe per 60min. \
+                                    Please check if this is the case!\n \
+                                    The problem occured at station: ",  station, ", from: ", start_time, ", until: ", end_time)
+            elif temporal_res == '60min' or temporal_res == '1H':
+                if len(reflect_vals) != len(rain_vals):
+                    raise Exception("Radar dataframe should be sampled per 60min and rain gauge dataframe per 60min. \
+                                    Please check if this is the case!\n \
+                                    The problem occured at station: ",  station, ", from: ", start_time, ", until: ", end_time)
+
+            # Store reflectivity values
+            Z_chunks.append(reflect_vals)
+
+    # Concatenate values of all events once
+    Z = np.concatenate(Z_chunks) if Z_chunks else np.empty(0)
+    R = np.concatenate(R_chunks) if R_chunks else np.empty(0)
+
+    return to_event_arrays(events), Z, R
+
+
+def to_event_arrays(events):
+    '''
+    Method to convert lists of event attributes to arrays.
 
-    return events, Z, R
+    @param events dict{str: list}: Event attributes, one list per attribute
+
+    @return events dict{str: array}: Event attributes, one array per attribute
+    '''
+    return {
+        'start_time': np.array(events['start_time'], dtype='datetime64[ns]'),
+        'end_time': np.array(events['end_time'], dtype='datetime64[ns]'),
+        'station': np.array(events['station'], dtype=object),
+        **{field: np.array(events[field], dtype=np.float64) for field in EVENT_FIELDS[3:]}
+    }
 
 
-def merge_overlapping_events(events):
+def merge_overlapping_events(events, plot=False):
     '''
     Method to merge single-station events that overlap in time.
 
-    @param events list[Event]: Events detected per station
+    @param events dict{str: array}: Events detected per station, one array per attribute
+    @param plot bool: Whether to plot the sorted single events
 
     @return result list[Event]: Events including multiple stations
     '''
-    # Sort the events on start time
-    events.sort(key=lambda e: e.start_time)
-
-    # Plot single events sorted
-    plot_single_events(events)
-
-    # Init list to store the merged events and store first event
-    result = [events[0]]
+    # Sort the events on start time (stable, so ties keep station order)
+    order = np.argsort(events['start_time'], kind='stable')
+    events = {field: values[order] for (field, values) in events.items()}
+    start_times = events['start_time']
+    end_times = events['end_time']
 
-    # Loop over events (and skip the first)
-    for e in events[1:]:
-        # Check if current event and last merged event overlap
-        if e.start_time <= result[-1].end_time:
-            # Merge events and overwrite last one in result
-            result[-1] = merge_two_events(result[-1], e)
-        else:
-            # If event is later than last merged, add event to the result
-            result.append(e)
-
-    return result
+    # No events to merge
+    if len(start_times) == 0:
+        return []
 
+    # Plot single events sorted
+    if plot:
+        plot_single_events(events)
 
-def merge_two_events(e1, e2):
-    '''
-    Method to merge two events.
+    # A new group starts when an event begins after all earlier events have ended
+    running_end = np.maximum.accumulate(end_times)
+    new_group = np.concatenate(([True], start_times[1:] > running_end[:-1]))
+    group_firsts = np.flatnonzero(new_group)
+    group_lasts = np.append(group_firsts[1:], len(start_times))
 
-    @param e1 Event: Event to be merged.
-    @param e2 Event: Event to be merged.
+    # Weigh averages by the duration (in hours) of the single events
+    durations = ((end_times - start_times) // np.timedelta64(1, 'h')).astype(np.float64)
+    total_durations = np.add.reduceat(durations, group_firsts)
 
-    @return merged_event Event: Merged event.
-    '''
-    # Pick earliest start time
-    start_time = min(e1.start_time, e2.start_time)
-    # Pick latest end time
-    end_time = max(e1.end_time, e2.end_time)
-    # Concat lists of stations
-    stations = e1.stations + e2.stations
+    # Pick earliest start time and latest end time
+    group_start_times = start_times[group_firsts]
+    group_end_times = running_end[group_lasts - 1]
 
     # Recompute reflectivity
-    reflect_min = min(e1.reflect_min, e2.reflect_min)
-    reflect_avg = (e1.reflect_avg * e1.duration + e2.reflect_avg * e2.duration) / (e1.duration + e2.duration)
-    reflect_max = max(e1.reflect_max, e2.reflect_max)
+    reflect_min = np.minimum.reduceat(events['reflect_min'], group_firsts)
+    reflect_avg = np.add.reduceat(events['reflect_avg'] * durations, group_firsts) / total_durations
+    reflect_max = np.maximum.reduceat(events['reflect_max'], group_firsts)
 
     # Recompute rain intensity
-    rain_intens_min = min(e1.rain_intens_min, e2.rain_intens_min)
-    rain_intens_avg = (e1.rain_intens_avg * e1.duration + e2.rain_intens_avg * e2.duration) / (e1.duration + e2.duration)
-    rain_intens_max = max(e1.rain_intens_max, e2.rain_intens_max)
+    rain_intens_min = np.minimum.reduceat(events['rain_intens_min'], group_firsts)
+    rain_intens_avg = np.add.reduceat(events['rain_intens_avg'] * durations, group_firsts) / total_durations
+    rain_intens_max = np.maximum.reduceat(events['rain_intens_max'], group_firsts)
+
+    # Classify all merged events at once
+    types = classify_events(rain_intens_avg)
 
-    # Create new event
-    merged_event = Event(start_time, end_time, stations, reflect_min, reflect_avg, reflect_max, rain_intens_min, rain_intens_avg, rain_intens_max)
+    # Create merged events
+    result = []
+    for k in range(len(group_firsts)):
+        stations = events['station'][group_firsts[k]:group_lasts[k]]
+        result.append(Event(group_start_times[k], group_end_times[k], stations, \
+                            reflect_min[k], reflect_avg[k], reflect_max[k], \
+                            rain_intens_min[k], rain_intens_avg[k], rain_intens_max[k], types[k]))
 
-    return merged_event
+    return result
 
 
 def plot_peak_over_threshold(rain_df, threshold=0.5):
@@ -236,15 +279,15 @@ def plot_peak_over_threshold(rain_df, threshold=0.5):
     '''
     # Select a station
     station = rain_df.columns[1]
-    vals = rain_df[station]
+    vals = rain_df[station].to_numpy()
 
     # Get time column
     datetime = rain_df.index
 
-    for i in range(len(vals)):
-        ax = plt.subplot()
-        ax.bar(datetime[i], vals[i], color='C0')
-    
+    # Plot all bars in one call
+    fig, ax = plt.subplots()
+    ax.bar(datetime, vals, color='C0')
+
     ax.xaxis_date()
     ax.axhline(y=threshold, color='r', linestyle='dashed', label='Threshold') 
 
@@ -259,25 +302,24 @@ def plot_single_events(events):
     '''
     Method to visualize all single events.
 
-    @param events list[Event]: List of events to plot.
+    @param events dict{str: array}: Events to plot, one array per attribute.
     '''
     # Create new plot
     fig = plt.figure()
     ax = fig.add_subplot()
 
-    # Loop over events
-    for i in range(100):
-        # Retrieve event
-        e = events[i]
+    # Select first 100 events
+    num_events = len(events['start_time'])
+    num_plotted = min(100, num_events)
 
-        # Convert to matplotlib date representation
-        start = mdates.date2num(e.start_time)
-        end = mdates.date2num(e.end_time)
-        width = end - start
+    # Convert to matplotlib date representation
+    starts = mdates.date2num(events['start_time'][:num_plotted])
+    ends = mdates.date2num(events['end_time'][:num_plotted])
+    widths = ends - starts
 
-        # Plot rectangle
-        rect = Rectangle((start, len(events)-i), width, 0.8)
-        ax.add_patch(rect)
+    # Plot rectangles in one collection
+    rects = [Rectangle((starts[i], num_events-i), widths[i], 0.8) for i in range(num_plotted)]
+    ax.add_collection(PatchCollection(rects))
 
     # Assign date locator / formatter to the x-axis to get proper labels
     locator = mdates.AutoDateLocator(minticks=3)
@@ -299,7 +341,7 @@ def plot_single_events(events):
     plt.show()
 
 
-def select_all_events(rain_df, radar_df, max_no_rain, min_rain_threshold=0.1):
+def select_all_events(rain_df, radar_df, max_no_rain, min_rain_threshold=0.1, plot=False, max_workers=1):
     '''
     Method that selects rain events from the rain gauge data.
 
@@ -307,62 +349,79 @@ def select_all_events(rain_df, radar_df, max_no_rain, min_rain_threshold=0.1):
     @param radar_df DataFrame: Radar data for one year of all stations
     @param max_no_rain int: Maximum number of hours without rain within one event
     @param k int: Rainfall threshold
+    @param plot bool: Whether to plot the sorted single events
+    @param max_workers int: Number of processes to select events with (serial if 1, all cores if None)
 
     @return events list[Event]: List of events for the given year
     @return Z array[float]: Vector of reflectivity values per hour per station within all events
     @return R array[float]: Vector of rainfall values per hour per station within all events
     '''
-    # Init event list
-    events = []
-    Z = []
-    R = []
-
     # Get time column
     datetime = rain_df.index
 
-    # Loop over stations and correspoding values
-    for (station, vals) in rain_df.items():
-        # Select events for single station
-        single_events, single_Z, single_R = select_events_single_station(station, vals, datetime, radar_df, max_no_rain, min_rain_threshold)
-        events += single_events
-        Z += single_Z
-        R += single_R
+    # Map each timestep to integer positions in the radar data once, shared by all stations
+    radar_start = radar_df.index.searchsorted(datetime, side='left')
+    radar_stop = radar_df.index.searchsorted(datetime, side='right') - 1
+
+    # Extract rain and radar values per station once, as plain arrays
+    stations = list(rain_df.columns)
+    rain_arrays = [rain_df[station].to_numpy() for station in stations]
+    radar_arrays = [radar_df[station].to_numpy() for station in stations]
+
+    # Select events per station, stations are independent so they can run in parallel
+    # Serial by default, since per-station work is small compared to starting processes and pickling arrays
+    args = (stations, rain_arrays, repeat(datetime.values), radar_arrays, repeat(radar_start), repeat(radar_stop), repeat(max_no_rain), repeat(min_rain_threshold))
+    if max_workers == 1:
+        results = list(map(select_events_single_station, *args))
+    else:
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            results = list(executor.map(select_events_single_station, *args))
+
+    # Unpack results per station
+    station_events = [r[0] for r in results]
+    Z_chunks = [r[1] for r in results]
+    R_chunks = [r[2] for r in results]
+
+    # Concatenate event attributes of all stations (empty arrays if there are no stations)
+    if station_events:
+        events = {field: np.concatenate([e[field] for e in station_events]) for field in EVENT_FIELDS}
+    else:
+        events = to_event_arrays({field: [] for field in EVENT_FIELDS})
 
     # Merge single-station events that overlap in time
-    if len(events) > 1:
-        events = merge_overlapping_events(events)
+    events = merge_overlapping_events(events, plot)
 
-    # Convert lists to numpy arrays for convience in calibration
-    Z = np.array(Z)
-    R = np.array(R)
+    # Concatenate values of all stations once
+    Z = np.concatenate(Z_chunks) if Z_chunks else np.empty(0)
+    R = np.concatenate(R_chunks) if R_chunks else np.empty(0)
 
     # Reshape reflectivity to vectors of 10, so a vector of values per hour
-    new_shape = (len(Z) // 10, 10)
-    Z = Z.reshape(new_shape)
+    Z = Z.reshape(-1, 10)
 
     # Throw exception if dimensions of Z and R do not correspond
     if len(Z) != len(R):
         raise Exception("Lengths of reflectivity vector Z and rainfall vector R not equal: " + str(len(Z)) + " != " + str(len(R)))
     
-    # Filter out pairs where reflectivity is 0
-    non_zero_mask = np.all(Z != 0, axis=1)
-    R = R[non_zero_mask]
-    Z = Z[non_zero_mask]
+    # Filter out pairs where reflectivity or rain intensity is 0 or nan, in a single pass
+    mask = np.all((Z != 0) & ~np.isnan(Z), axis=1) & (R != 0) & ~np.isnan(R)
+    Z = Z[mask]
+    R = R[mask]
 
-    # Filter out pairs where reflectivity is nan
-    non_nan_mask = np.all(~np.isnan(Z), axis=1)
-    R = R[non_nan_mask]
-    Z = Z[non_nan_mask]
+    return events, Z, R
 
-    # Filter out pairs where rain intensity is 0
-    Z = Z[R != 0]
-    R = R[R != 0]
 
-    # Filter out pairs where rain intensity is nan
-    Z = Z[~np.isnan(R)]
-    R = R[~np.isnan(R)]
+def to_dBZ(Z):
+    '''
+    Method to convert reflectivity from Z to dBZ, clipped at 0 dBZ.
 
-    return events, Z, R
+    @param Z array[float]: Reflectivity values in Z.
+
+    @return dBZ array[float]: Reflectivity values in dBZ (0 where Z is 0).
+    '''
+    # Replace 0 by 1 before taking the log, so 0 maps to 0 dBZ without warnings
+    dBZ = np.maximum(10*np.log10(np.where(Z == 0, 1.0, Z)), 0.0)
+
+    return dBZ
 
 
 def write_events_to_excel(events, save_path):
@@ -370,7 +429,7 @@ def write_events_to_excel(events, save_path):
     Method save events in excel file.
 
     @param events list[Event]: List of events for the given year
-    @param save_path str: Path where file should be saved (including .xlsx extension)
+    @param save_path str: Path where file should be saved (including .xlsx extension, or .parquet for columnar output)
     '''
 
     # Set column names
@@ -380,22 +439,28 @@ def write_events_to_excel(events, save_path):
                 'rain_initens_min', 'rain_intens_avg', 'rain_intens_max', 'rain_cum_avg', \
                 'type']
     
-    # Init empty DataFrame
-    events_df = pd.DataFrame(columns=columns)
-    # Init func for Z -> dBZ conversion
-    to_dBZ = lambda x : 0 if x == 0 else max(10*math.log10(x), 0)
-
-    # Loop over events
-    for e in events:
-        # Convert attributes from event into row
-        event_row = [e.start_time, e.end_time, e.duration, \
-                    e.stations, e.num_stations, \
-                    to_dBZ(e.reflect_min), to_dBZ(e.reflect_avg), to_dBZ(e.reflect_max), \
-                    e.rain_intens_min, e.rain_intens_avg, e.rain_intens_max, e.rain_cum_avg, \
-                    e.type]
-        
-        # Store in dataframe
-        events_df.loc[len(events_df)] = event_row
+    # Event attribute stored in each column
+    attributes = ['start_time', 'end_time', 'duration', \
+                'stations', 'num_stations', \
+                'reflect_min', 'reflect_avg', 'reflect_max', \
+                'rain_intens_min', 'rain_intens_avg', 'rain_intens_max', 'rain_cum_avg', \
+                'type']
+
+    # Gather attributes column by column, so every column is built with its own dtype directly
+    values = {column: [getattr(e, attribute) for e in events] for (column, attribute) in zip(columns, attributes)}
+
+    # Join stations into a single string per event, so every column is scalar
+    values['stations'] = [';'.join(map(str, stations)) for stations in values['stations']]
+
+    # Convert reflectivity columns from Z to dBZ at once
+    for column in ['reflect_min_dBZ', 'reflect_avg_dBZ', 'reflect_max_dBZ']:
+        values[column] = to_dBZ(np.array(values[column], dtype=np.float64))
+
+    # Build DataFrame in one go, instead of growing it row by row
+    events_df = pd.DataFrame(values, columns=columns)
 
-    # Write DataFrame to excel
-    events_df.to_excel(save_path)
\ No newline at end of file
+    # Write DataFrame to parquet if requested, otherwise to excel
+    if save_path.endswith('.parquet'):
+        events_df.to_parquet(save_path, index=False)
+    else:
+        events_df.to_excel(save_path, engine='xlsxwriter', index=False)
\ No newline at end of file